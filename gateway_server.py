@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""
+Self-hosted HTTP gateway for InfiniteTalk
+Serves the generate/status/get_output actions on our own GPU boxes,
+backed by a persistent job queue and a pool of GPU-pinned workers
+"""
+
+import os
+import json
+import time
+import uuid
+import math
+import copy
+import signal
+import argparse
+import importlib
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Handler module providing generate_video/load_models (runpod_handler_test for a fake backend)
+GATEWAY_BACKEND = os.environ.get("GATEWAY_BACKEND", "runpod_handler")
+GATEWAY_HOST = os.environ.get("GATEWAY_HOST", "0.0.0.0")
+GATEWAY_PORT = int(os.environ.get("GATEWAY_PORT", "8080"))
+# Maximum number of queued (not yet running) jobs before returning 429
+GATEWAY_MAX_QUEUED = int(os.environ.get("GATEWAY_MAX_QUEUED", "64"))
+# One worker per GPU group, groups separated by ';' (e.g. "0;1" or "0,1;2,3")
+GATEWAY_GPUS = os.environ.get("GATEWAY_GPUS", "0")
+# Fair-share weights per tenant (e.g. "acme=4,nightly=1"); unlisted tenants get 1
+GATEWAY_TENANT_WEIGHTS = os.environ.get("GATEWAY_TENANT_WEIGHTS", "")
+# Maximum queued jobs per tenant before returning 429 (0 disables the quota)
+GATEWAY_TENANT_MAX_QUEUED = int(os.environ.get("GATEWAY_TENANT_MAX_QUEUED", "0"))
+# Clip windows a tenant may spend per round-robin turn at weight 1
+GATEWAY_DRR_QUANTUM = int(os.environ.get("GATEWAY_DRR_QUANTUM", "13"))
+
+# Classes are served strictly in this order; tenants share each class by weight
+PRIORITY_CLASSES = ("interactive", "standard", "bulk")
+DEFAULT_PRIORITY = "standard"
+DEFAULT_TENANT = "default"
+
+# Handler defaults, used to estimate job cost in clip windows
+DEFAULT_FRAME_NUM = 81
+DEFAULT_MAX_FRAME_NUM = 1000
+# Largest accepted job, in clip windows (max_frame_num / frame_num)
+MAX_JOB_COST = 1000
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class QueueClosedError(Exception):
+    """Raised when the job queue is draining and no longer accepts jobs"""
+
+
+def parse_tenant_weights(spec: str) -> Dict[str, int]:
+    """Parse "acme=4,nightly=1" into a tenant -> weight mapping"""
+    weights = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        tenant, _, weight = item.partition("=")
+        try:
+            weights[tenant.strip()] = max(1, int(weight))
+        except ValueError:
+            raise ValueError(f"Invalid tenant weight {item.strip()!r}, expected tenant=weight")
+    return weights
+
+
+def job_cost(job_input: Dict[str, Any]) -> int:
+    """Estimated clip windows a job will generate"""
+    try:
+        frame_num = max(1, int(job_input.get("frame_num", DEFAULT_FRAME_NUM)))
+        max_frame_num = int(job_input.get("max_frame_num", DEFAULT_MAX_FRAME_NUM))
+    except (TypeError, ValueError):
+        raise ValueError("frame_num and max_frame_num must be integers")
+
+    cost = max(1, math.ceil(max_frame_num / frame_num))
+    if cost > MAX_JOB_COST:
+        raise ValueError(f"Job too large: max_frame_num / frame_num exceeds {MAX_JOB_COST} clip windows")
+    return cost
+
+
+class FairShareScheduler:
+    """Strict priority classes with weighted deficit round-robin across tenants
+
+    Within a class each tenant with queued jobs takes turns; a turn grants
+    quantum * weight clip windows of credit and the tenant keeps dispatching
+    jobs while its credit covers the next job's cost. Unused credit carries
+    over until the tenant's queue empties.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None,
+                 quantum: int = GATEWAY_DRR_QUANTUM):
+        if quantum < 1:
+            raise ValueError(f"DRR quantum must be at least 1, got {quantum}")
+        self.weights = weights or {}
+        self.quantum = quantum
+        self._queues = {cls: {} for cls in PRIORITY_CLASSES}
+        self._rotation = {cls: deque() for cls in PRIORITY_CLASSES}
+        self._deficit = {cls: {} for cls in PRIORITY_CLASSES}
+        self._granted = {cls: False for cls in PRIORITY_CLASSES}
+        self._size = 0
+        self._order: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def tenant_count(self, tenant: str) -> int:
+        return sum(len(queues.get(tenant, ())) for queues in self._queues.values())
+
+    def push(self, job_id: str, priority: str, tenant: str, cost: int):
+        queues = self._queues[priority]
+        if tenant not in queues:
+            queues[tenant] = deque()
+            self._rotation[priority].append(tenant)
+            self._deficit[priority][tenant] = 0
+        queues[tenant].append((job_id, cost))
+        self._size += 1
+        self._order = None
+
+    def pop(self) -> Optional[str]:
+        for cls in PRIORITY_CLASSES:
+            if self._rotation[cls]:
+                self._size -= 1
+                self._order = None
+                return self._pop_class(cls)
+        return None
+
+    def _pop_class(self, cls: str) -> str:
+        rotation = self._rotation[cls]
+        deficit = self._deficit[cls]
+        count = len(rotation)
+        credits = [self.quantum * self.weights.get(tenant, 1) for tenant in rotation]
+
+        # Turn t visits rotation[t % count] and grants it credit (unless it is
+        # the head and already granted); find the first turn whose tenant can
+        # afford its next job without stepping through the rounds one by one
+        turns = []
+        for index, tenant in enumerate(rotation):
+            shortfall = self._queues[cls][tenant][0][1] - deficit[tenant]
+            grants = math.ceil(shortfall / credits[index])
+            if index == 0 and self._granted[cls]:
+                turns.append(max(0, grants) * count)
+            else:
+                turns.append(index + (max(1, grants) - 1) * count)
+        turn = min(turns)
+
+        for index, tenant in enumerate(rotation):
+            visits = len(range(index, turn + 1, count))
+            if index == 0 and self._granted[cls]:
+                visits -= 1
+            deficit[tenant] += visits * credits[index]
+        rotation.rotate(-(turn % count))
+        self._granted[cls] = True
+
+        tenant = rotation[0]
+        queue = self._queues[cls][tenant]
+        job_id, cost = queue.popleft()
+        deficit[tenant] -= cost
+        if not queue:
+            # An idle tenant does not bank credit
+            del self._queues[cls][tenant]
+            del deficit[tenant]
+            rotation.popleft()
+            self._granted[cls] = False
+        return job_id
+
+    def order(self) -> List[str]:
+        """Queued job ids in the order they would be dispatched"""
+        if self._order is None:
+            simulation = copy.deepcopy(self)
+            self._order = [simulation.pop() for _ in range(len(simulation))]
+        return list(self._order)
+
+
+class JobQueue:
+    """Fair-share queue of generation jobs persisted as one JSON file per job
+
+    Dispatch order comes from FairShareScheduler. Jobs that were queued or
+    running when the process stopped are put back on the queue when it is
+    reopened.
+    """
+
+    def __init__(self, storage_path: str, max_queued: int = GATEWAY_MAX_QUEUED,
+                 tenant_weights: Optional[Dict[str, int]] = None,
+                 tenant_max_queued: int = GATEWAY_TENANT_MAX_QUEUED):
+        self.storage_path = storage_path
+        self.max_queued = max_queued
+        self.tenant_max_queued = tenant_max_queued
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._scheduler = FairShareScheduler(tenant_weights)
+        self._closed = False
+        self._cond = threading.Condition()
+
+        os.makedirs(storage_path, exist_ok=True)
+        self._load()
+
+    def _job_file(self, job_id: str) -> str:
+        return os.path.join(self.storage_path, f"{job_id}.json")
+
+    def _persist(self, job: Dict[str, Any]):
+        path = self._job_file(job["job_id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _push(self, job: Dict[str, Any]):
+        self._scheduler.push(job["job_id"], job["priority"], job["tenant"],
+                             job_cost(job["input"]))
+
+    def _load(self):
+        """Reload persisted jobs, re-queueing anything that never finished"""
+        pending = []
+        for name in os.listdir(self.storage_path):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.storage_path, name)) as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable job file {name}: {e}")
+                continue
+            if "job_id" not in job or "input" not in job:
+                continue
+            # Records written before priority classes and tenants existed
+            if job.get("priority") not in PRIORITY_CLASSES:
+                job["priority"] = DEFAULT_PRIORITY
+            job.setdefault("tenant", DEFAULT_TENANT)
+
+            self.jobs[job["job_id"]] = job
+            if job.get("status") in ("queued", "in_progress"):
+                try:
+                    job_cost(job["input"])
+                except ValueError as e:
+                    # Accepted before the current limits; fail it instead of queueing
+                    job["status"] = "failed"
+                    job["error"] = str(e)
+                    job["failed_at"] = time.time()
+                    self._persist(job)
+                    continue
+                pending.append(job)
+
+        for job in sorted(pending, key=lambda j: j.get("queued_at", 0)):
+            if job["status"] == "in_progress":
+                logger.info(f"Re-queueing interrupted job {job['job_id']}")
+                job["status"] = "queued"
+                job.pop("started_at", None)
+                self._persist(job)
+            self._push(job)
+
+        if pending:
+            logger.info(f"Restored {len(pending)} pending jobs from {self.storage_path}")
+
+    def submit(self, job_input: Dict[str, Any], priority: str = DEFAULT_PRIORITY,
+               tenant: str = DEFAULT_TENANT) -> Dict[str, Any]:
+        """Add a job to the queue and return its record"""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority: {priority}. Use one of {', '.join(PRIORITY_CLASSES)}")
+        # Reject malformed frame counts before anything is persisted
+        job_cost(job_input)
+
+        with self._cond:
+            if self._closed:
+                raise QueueClosedError("Gateway is draining, not accepting new jobs")
+            if len(self._scheduler) >= self.max_queued:
+                raise QueueFullError(f"Queue is full ({self.max_queued} jobs waiting)")
+            if self.tenant_max_queued and \
+                    self._scheduler.tenant_count(tenant) >= self.tenant_max_queued:
+                raise QueueFullError(
+                    f"Tenant {tenant} has {self.tenant_max_queued} jobs waiting")
+
+            job = {
+                "job_id": str(uuid.uuid4()),
+                "status": "queued",
+                "priority": priority,
+                "tenant": tenant,
+                "input": job_input,
+                "queued_at": time.time()
+            }
+            self.jobs[job["job_id"]] = job
+            self._persist(job)
+            self._push(job)
+            self._cond.notify()
+            return dict(job)
+
+    def next(self) -> Optional[Dict[str, Any]]:
+        """Block until a job is available and mark it in progress
+
+        Returns None once the queue is closed, leaving queued jobs persisted
+        for the next start.
+        """
+        with self._cond:
+            while not len(self._scheduler) and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+
+            job = self.jobs[self._scheduler.pop()]
+            job["status"] = "in_progress"
+            job["started_at"] = time.time()
+            self._persist(job)
+            return dict(job)
+
+    def finish(self, job_id: str, result: Dict[str, Any]):
+        """Record the backend result of a job"""
+        with self._cond:
+            job = self.jobs[job_id]
+            job["status"] = result.get("status", "failed")
+            for key in ("output_path", "presigned_url", "error"):
+                if result.get(key) is not None:
+                    job[key] = result[key]
+            job["completed_at" if job["status"] == "completed" else "failed_at"] = time.time()
+            self._persist(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a queued job, None if it is not waiting"""
+        with self._cond:
+            order = self._scheduler.order()
+            return order.index(job_id) + 1 if job_id in order else None
+
+    def queued_count(self) -> int:
+        with self._cond:
+            return len(self._scheduler)
+
+    def close(self):
+        """Stop accepting jobs and release idle workers"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Worker(threading.Thread):
+    """Runs queued jobs one at a time on a fixed set of GPUs"""
+
+    def __init__(self, queue: JobQueue, backend, gpu_ids: str):
+        super().__init__(name=f"worker-gpu{gpu_ids}", daemon=True)
+        self.queue = queue
+        self.backend = backend
+        self.gpu_ids = gpu_ids
+        self.current_job: Optional[str] = None
+
+    def run(self):
+        logger.info(f"Worker started on GPUs {self.gpu_ids}")
+        while True:
+            job = self.queue.next()
+            if job is None:
+                break
+
+            self.current_job = job["job_id"]
+            logger.info(f"Worker on GPUs {self.gpu_ids} running job {job['job_id']}")
+            try:
+                result = self.backend.generate_video(
+                    job["input"], job_id=job["job_id"], gpu_ids=self.gpu_ids
+                )
+            except Exception as e:
+                logger.error(f"Worker crashed on job {job['job_id']}: {e}")
+                result = {"status": "failed", "error": str(e)}
+            self.queue.finish(job["job_id"], result)
+            self.current_job = None
+        logger.info(f"Worker on GPUs {self.gpu_ids} stopped")
+
+
+class Gateway:
+    """Action layer shared by the HTTP server, mirroring the RunPod handler"""
+
+    def __init__(self, backend, queue: JobQueue, gpu_groups: List[str]):
+        self.backend = backend
+        self.queue = queue
+        self.workers = [Worker(queue, backend, gpu_ids) for gpu_ids in gpu_groups]
+
+    def start(self):
+        if not getattr(self.backend, "model_loaded", True):
+            self.backend.load_models()
+        for worker in self.workers:
+            worker.start()
+
+    def drain(self):
+        """Stop intake and wait for running jobs to finish"""
+        logger.info("Draining gateway, waiting for running jobs...")
+        self.queue.close()
+        for worker in self.workers:
+            worker.join()
+        logger.info(f"Drained; {self.queue.queued_count()} queued jobs kept for next start")
+
+    def generate(self, job_input: Dict[str, Any]) -> Dict[str, Any]:
+        priority = job_input.pop("priority", DEFAULT_PRIORITY)
+        tenant = str(job_input.pop("tenant", DEFAULT_TENANT))
+        job = self.queue.submit(job_input, priority, tenant)
+        return {
+            "job_id": job["job_id"],
+            "status": "queued",
+            "queue_position": self.queue.position(job["job_id"])
+        }
+
+    def check_status(self, job_input: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = job_input.get("job_id")
+
+        if not job_id:
+            return {"error": "job_id is required"}
+
+        job = self.queue.get(job_id)
+        if not job:
+            return {"error": "Job not found"}
+
+        job.pop("input", None)
+        if job["status"] == "queued":
+            job["queue_position"] = self.queue.position(job_id)
+        # Seconds spent waiting in the queue, still growing while queued
+        job["wait_time"] = round(job.get("started_at", time.time()) - job["queued_at"], 3)
+        return job
+
+    def get_output(self, job_input: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = job_input.get("job_id")
+
+        if not job_id:
+            return {"error": "job_id is required"}
+
+        job_info = self.queue.get(job_id)
+        if not job_info:
+            return {"error": "Job not found"}
+
+        if job_info["status"] != "completed":
+            return {"error": f"Job is not completed. Current status: {job_info['status']}"}
+
+        output_path = job_info.get("output_path")
+
+        if not output_path or not os.path.exists(output_path):
+            return {"error": "Output file not found"}
+
+        presigned_url = job_info.get("presigned_url")
+        if presigned_url:
+            return {
+                "job_id": job_id,
+                "status": "completed",
+                "download_url": presigned_url,
+                "local_path": output_path
+            }
+
+        return {
+            "job_id": job_id,
+            "status": "completed",
+            "local_path": output_path,
+            "message": "File available on volume storage"
+        }
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "queued": self.queue.queued_count(),
+            "max_queued": self.queue.max_queued,
+            "workers": [
+                {"gpu_ids": w.gpu_ids, "job_id": w.current_job} for w in self.workers
+            ]
+        }
+
+
+class GatewayRequestHandler(BaseHTTPRequestHandler):
+    """POST /generate, /status, /get_output with the handler's JSON input; GET /health"""
+
+    gateway: Gateway = None
+
+    def _send_json(self, code: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send_json(200, self.gateway.health())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        action = self.path.strip("/")
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        # read(-1) would block until the client closes the connection
+        if length < 0:
+            self._send_json(400, {"error": "Invalid Content-Length"})
+            return
+
+        try:
+            job_input = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Request body must be JSON"})
+            return
+        # Accept the RunPod-style {"input": {...}} envelope as well
+        if isinstance(job_input, dict) and isinstance(job_input.get("input"), dict):
+            job_input = job_input["input"]
+        if not isinstance(job_input, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return
+
+        if action == "generate":
+            try:
+                self._send_json(202, self.gateway.generate(job_input))
+            except QueueFullError as e:
+                self._send_json(429, {"error": str(e)})
+            except QueueClosedError as e:
+                self._send_json(503, {"error": str(e)})
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+        elif action in ("status", "get_output"):
+            if action == "status":
+                result = self.gateway.check_status(job_input)
+            else:
+                result = self.gateway.get_output(job_input)
+
+            if result.get("error") == "job_id is required":
+                self._send_json(400, result)
+            elif result.get("error") == "Job not found":
+                self._send_json(404, result)
+            else:
+                self._send_json(200, result)
+        else:
+            self._send_json(404, {"error": f"Unknown action: {action}"})
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} - {format % args}")
+
+
+def parse_gpu_groups(spec: str) -> List[str]:
+    """Split "0,1;2,3" into one CUDA_VISIBLE_DEVICES value per worker"""
+    groups = [group.strip() for group in spec.split(";") if group.strip()]
+    if not groups:
+        raise ValueError("At least one GPU group is required")
+    return groups
+
+
+def create_server(backend_name: str, host: str, port: int, gpus: str,
+                  max_queued: int, storage_path: Optional[str] = None,
+                  tenant_weights: str = GATEWAY_TENANT_WEIGHTS,
+                  tenant_max_queued: int = GATEWAY_TENANT_MAX_QUEUED):
+    """Build the gateway and its HTTP server without starting either"""
+    backend = importlib.import_module(backend_name)
+    queue = JobQueue(storage_path or os.path.join(backend.JOB_STORAGE_PATH, "gateway"),
+                     max_queued, parse_tenant_weights(tenant_weights), tenant_max_queued)
+    gateway = Gateway(backend, queue, parse_gpu_groups(gpus))
+
+    request_handler = type("BoundGatewayRequestHandler", (GatewayRequestHandler,),
+                           {"gateway": gateway})
+    server = ThreadingHTTPServer((host, port), request_handler)
+    return gateway, server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-hosted InfiniteTalk HTTP gateway")
+    parser.add_argument("--backend", default=GATEWAY_BACKEND, help="Handler module to run jobs with")
+    parser.add_argument("--host", default=GATEWAY_HOST)
+    parser.add_argument("--port", type=int, default=GATEWAY_PORT)
+    parser.add_argument("--gpus", default=GATEWAY_GPUS, help='GPU groups, one worker each (e.g. "0;1")')
+    parser.add_argument("--max-queued", type=int, default=GATEWAY_MAX_QUEUED,
+                        help="Queued jobs allowed before returning 429")
+    parser.add_argument("--storage-path", help="Job queue directory (default: <JOB_STORAGE_PATH>/gateway)")
+    parser.add_argument("--tenant-weights", default=GATEWAY_TENANT_WEIGHTS,
+                        help='Fair-share weights per tenant (e.g. "acme=4,nightly=1")')
+    parser.add_argument("--tenant-max-queued", type=int, default=GATEWAY_TENANT_MAX_QUEUED,
+                        help="Queued jobs allowed per tenant before returning 429 (0 = no quota)")
+
+    args = parser.parse_args()
+
+    gateway, server = create_server(args.backend, args.host, args.port, args.gpus,
+                                    args.max_queued, args.storage_path,
+                                    args.tenant_weights, args.tenant_max_queued)
+
+    def drain_and_stop():
+        # Keep serving status/get_output while running jobs finish
+        gateway.drain()
+        server.shutdown()
+
+    def shutdown(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down...")
+        # shutdown() blocks until serve_forever returns, so call it off the main thread
+        threading.Thread(target=drain_and_stop, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    gateway.start()
+    logger.info(f"Gateway listening on {args.host}:{args.port} with backend {args.backend}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
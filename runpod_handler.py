@@ -75,9 +75,14 @@ def load_models():
         logger.error(f"Failed to load models: {e}")
         raise
 
-def generate_video(job_input: Dict[str, Any]) -> Dict[str, Any]:
-    """Generate video using InfiniteTalk"""
-    job_id = str(uuid.uuid4())
+def generate_video(job_input: Dict[str, Any], job_id: Optional[str] = None,
+                   gpu_ids: Optional[str] = None) -> Dict[str, Any]:
+    """Generate video using InfiniteTalk
+
+    job_id lets a caller (e.g. the gateway) reuse its own id; gpu_ids pins
+    the generation subprocess via CUDA_VISIBLE_DEVICES.
+    """
+    job_id = job_id or str(uuid.uuid4())
 
     jobs_status[job_id] = {
         "status": "in_progress",
@@ -166,12 +171,18 @@ def generate_video(job_input: Dict[str, Any]) -> Dict[str, Any]:
 
         logger.info(f"Running command: {' '.join(cmd)}")
 
+        env = None
+        if gpu_ids is not None:
+            env = dict(os.environ, CUDA_VISIBLE_DEVICES=gpu_ids)
+            logger.info(f"Pinning job {job_id} to GPUs {gpu_ids}")
+
         process = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
-            cwd="/workspace/InfiniteTalk"
+            cwd="/workspace/InfiniteTalk",
+            env=env
         )
 
         stdout, stderr = process.communicate()
@@ -29,9 +29,10 @@ def load_models():
     logger.info("Skipping model loading in test mode")
     model_loaded = True
 
-def generate_video(job_input: Dict[str, Any]) -> Dict[str, Any]:
+def generate_video(job_input: Dict[str, Any], job_id: Optional[str] = None,
+                   gpu_ids: Optional[str] = None) -> Dict[str, Any]:
     """Mock video generation for testing"""
-    job_id = str(uuid.uuid4())
+    job_id = job_id or str(uuid.uuid4())
 
     # Update job status
     jobs_status[job_id] = {
@@ -61,6 +62,10 @@ def generate_video(job_input: Dict[str, Any]) -> Dict[str, Any]:
     logger.info(f"Audio: {audio_url}")
     logger.info(f"Image: {image_url}")
     logger.info(f"Size: {job_input.get('size', 'infinitetalk-480')}")
+    logger.info(f"GPUs: {gpu_ids if gpu_ids is not None else 'default'}")
+
+    # Optional artificial delay so queueing can be exercised
+    time.sleep(float(job_input.get("mock_delay", 0)))
 
     # Mock output path
     output_path = f"{OUTPUT_STORAGE_PATH}/{job_id}.mp4"
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Local test script for the self-hosted InfiniteTalk gateway
+Runs the gateway against runpod_handler_test as a fake backend
+"""
+
+import sys
+import json
+import time
+import types
+import tempfile
+import http.client
+import threading
+import urllib.error
+import urllib.request
+
+# runpod_handler_test imports runpod but the gateway never calls it
+sys.modules.setdefault('runpod', types.ModuleType('runpod'))
+
+import gateway_server
+
+SAMPLE_INPUT = {
+    "audio_url": "https://example.com/test.wav",
+    "image_url": "https://example.com/test.jpg",
+    "size": "infinitetalk-480"
+}
+
+
+def start_gateway(storage_path, gpus="0", max_queued=8):
+    gateway, server = gateway_server.create_server(
+        "runpod_handler_test", "127.0.0.1", 0, gpus, max_queued, storage_path
+    )
+    gateway.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return gateway, server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stop_gateway(gateway, server):
+    gateway.drain()
+    server.shutdown()
+    server.server_close()
+
+
+def post(base_url, action, body):
+    request = urllib.request.Request(
+        f"{base_url}/{action}",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait_for(base_url, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        _, status = post(base_url, "status", {"job_id": job_id})
+        if status.get("status") in ("completed", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+
+
+def test_generate_status_and_output():
+    with tempfile.TemporaryDirectory() as storage_path:
+        gateway, server, base_url = start_gateway(storage_path)
+        try:
+            code, result = post(base_url, "generate", SAMPLE_INPUT)
+            assert code == 202, result
+            assert result["status"] == "queued"
+
+            status = wait_for(base_url, result["job_id"])
+            assert status["status"] == "completed", status
+
+            code, output = post(base_url, "get_output", {"job_id": result["job_id"]})
+            assert code == 200, output
+            assert output["download_url"].endswith(f"{result['job_id']}.mp4")
+
+            code, bad = post(base_url, "generate", dict(SAMPLE_INPUT, frame_num=None))
+            assert code == 400 and "frame_num" in bad["error"], bad
+
+            code, missing = post(base_url, "status", {"job_id": "missing"})
+            assert code == 404 and missing["error"] == "Job not found"
+
+            connection = http.client.HTTPConnection(*server.server_address[:2], timeout=5)
+            connection.putrequest("POST", "/generate")
+            connection.putheader("Content-Length", "-1")
+            connection.endheaders()
+            response = connection.getresponse()
+            assert response.status == 400, response.read()
+            connection.close()
+        finally:
+            stop_gateway(gateway, server)
+
+
+def test_backpressure_and_priority():
+    with tempfile.TemporaryDirectory() as storage_path:
+        gateway, server, base_url = start_gateway(storage_path, max_queued=2)
+        try:
+            # Occupy the single worker so later jobs stay queued
+            _, blocker = post(base_url, "generate", dict(SAMPLE_INPUT, mock_delay=0.5))
+            while post(base_url, "status", {"job_id": blocker["job_id"]})[1]["status"] == "queued":
+                time.sleep(0.01)
+
+            _, low = post(base_url, "generate", SAMPLE_INPUT)
+            _, high = post(base_url, "generate", dict(SAMPLE_INPUT, priority="interactive"))
+            assert post(base_url, "status", {"job_id": high["job_id"]})[1]["queue_position"] == 1
+            low_queued = post(base_url, "status", {"job_id": low["job_id"]})[1]
+            assert low_queued["queue_position"] == 2
+            assert low_queued["wait_time"] >= 0
+
+            code, full = post(base_url, "generate", SAMPLE_INPUT)
+            assert code == 429, full
+
+            high_status = wait_for(base_url, high["job_id"])
+            low_status = wait_for(base_url, low["job_id"])
+            assert high_status["started_at"] <= low_status["started_at"]
+        finally:
+            stop_gateway(gateway, server)
+
+
+def test_fair_share_across_tenants():
+    scheduler = gateway_server.FairShareScheduler({"preview": 2}, quantum=1)
+    for i in range(4):
+        scheduler.push(f"bulk-{i}", "standard", "nightly", 1)
+    scheduler.push("preview-0", "standard", "preview", 1)
+    scheduler.push("preview-1", "standard", "preview", 1)
+    scheduler.push("urgent", "interactive", "nightly", 1)
+
+    # Interactive first, then preview gets two turns for each nightly turn
+    assert scheduler.order() == [
+        "urgent", "bulk-0", "preview-0", "preview-1", "bulk-1", "bulk-2", "bulk-3"
+    ]
+    assert [scheduler.pop() for _ in range(3)] == ["urgent", "bulk-0", "preview-0"]
+    assert len(scheduler) == 4
+
+
+def test_long_jobs_spend_more_credit():
+    scheduler = gateway_server.FairShareScheduler(quantum=13)
+    long_input = {"frame_num": 81, "max_frame_num": 81 * 26}
+    for i in range(2):
+        scheduler.push(f"long-{i}", "bulk", "nightly", gateway_server.job_cost(long_input))
+    for i in range(3):
+        scheduler.push(f"short-{i}", "bulk", "acme", gateway_server.job_cost({}))
+
+    assert scheduler.order() == ["short-0", "long-0", "short-1", "short-2", "long-1"]
+
+
+def test_scheduler_rejects_bad_config_and_input():
+    for quantum in (0, -1):
+        try:
+            gateway_server.FairShareScheduler(quantum=quantum)
+            raise AssertionError(f"quantum={quantum} was accepted")
+        except ValueError:
+            pass
+
+    for spec in ("acme", "acme=x"):
+        try:
+            gateway_server.parse_tenant_weights(spec)
+            raise AssertionError(f"weights {spec!r} were accepted")
+        except ValueError as e:
+            assert "tenant=weight" in str(e)
+
+    for job_input in ({"frame_num": None}, {"max_frame_num": [1]},
+                      {"frame_num": 1, "max_frame_num": 10 ** 8}):
+        try:
+            gateway_server.job_cost(job_input)
+            raise AssertionError(f"{job_input} was accepted")
+        except ValueError:
+            pass
+
+
+def test_large_costs_dispatch_without_stepping_rounds():
+    scheduler = gateway_server.FairShareScheduler(quantum=1)
+    scheduler.push("huge", "bulk", "nightly", 10 ** 9)
+    scheduler.push("small", "bulk", "acme", 1)
+
+    start = time.time()
+    assert scheduler.order() == ["small", "huge"]
+    assert time.time() - start < 0.1
+
+
+def test_tenant_quota():
+    with tempfile.TemporaryDirectory() as storage_path:
+        queue = gateway_server.JobQueue(storage_path, tenant_max_queued=1)
+        queue.submit(dict(SAMPLE_INPUT), tenant="nightly")
+        try:
+            queue.submit(dict(SAMPLE_INPUT), tenant="nightly")
+            raise AssertionError("Tenant quota was not enforced")
+        except gateway_server.QueueFullError:
+            pass
+        queue.submit(dict(SAMPLE_INPUT), tenant="acme")
+        queue.close()
+
+
+def test_queue_survives_restart():
+    with tempfile.TemporaryDirectory() as storage_path:
+        queue = gateway_server.JobQueue(storage_path)
+        job = queue.submit(dict(SAMPLE_INPUT))
+        queue.close()
+
+        gateway, server, base_url = start_gateway(storage_path)
+        try:
+            status = wait_for(base_url, job["job_id"])
+            assert status["status"] == "completed", status
+        finally:
+            stop_gateway(gateway, server)
+
+
+if __name__ == "__main__":
+    for test in (test_generate_status_and_output, test_backpressure_and_priority,
+                 test_fair_share_across_tenants, test_long_jobs_spend_more_credit,
+                 test_scheduler_rejects_bad_config_and_input,
+                 test_large_costs_dispatch_without_stepping_rounds,
+                 test_tenant_quota, test_queue_survives_restart):
+        print(f"\n{'='*60}")
+        print(f"Running: {test.__name__}")
+        print(f"{'='*60}")
+        test()
+        print("OK")